@@ -2,6 +2,7 @@
 
 import os
 import re
+import sys
 import datetime
 import requests
 import pandas as pd
@@ -16,6 +17,10 @@ PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir))
 DATA_DIR     = os.path.join(PROJECT_ROOT, "Datasets")
 OUTPUT       = os.path.join(PROJECT_ROOT, "combined_dataset.csv")
 
+sys.path.insert(0, PROJECT_ROOT)
+from common import instrumentation as metrics
+from common import schema
+
 # Proxy: assume data was collected OFFSET_YEARS before publication
 # Since we don't actually know when all this data was collected and what time period it corresponds to, 
 # we are proxying by using the dataset publication date - OFFSET_YEARS as the date of collection.
@@ -81,7 +86,9 @@ def load_cpi():
         "observation_start":"2015-01-01",
         "observation_end":  REFERENCE_DATE.isoformat(),
     }
-    resp = requests.get(url, params=params).json().get("observations", [])
+    with metrics.stage("sanitize.load_cpi"), metrics.timer("sanitize.fred_request"):
+        resp = requests.get(url, params=params).json().get("observations", [])
+    metrics.incr("sanitize.fred_requests")
     records = []
     for o in resp:
         if o["value"] != ".":
@@ -104,26 +111,31 @@ def get_fx_rate(date_str, base_ccy):
         return 1.0
     key = (date_str, base_ccy)
     if key in FX_CACHE:
+        metrics.cache("sanitize.fx", hit=True)
         return FX_CACHE[key]
+    metrics.cache("sanitize.fx", hit=False)
     if not EXCHANGE_API_KEY:
         rate = 1.0
     else:
         try:
-            r = requests.get(
-                "https://api.exchangerate.host/convert",
-                params={
-                    "access_key": EXCHANGE_API_KEY,
-                    "from":       base_ccy,
-                    "to":         "USD",
-                    "date":       date_str,
-                    "amount":     1
-                }
-            ).json()
+            metrics.incr("sanitize.fx_requests")
+            with metrics.timer("sanitize.fx_request"):
+                r = requests.get(
+                    "https://api.exchangerate.host/convert",
+                    params={
+                        "access_key": EXCHANGE_API_KEY,
+                        "from":       base_ccy,
+                        "to":         "USD",
+                        "date":       date_str,
+                        "amount":     1
+                    }
+                ).json()
             # prefer top-level result, then info.rate
             rate = r.get("result") or r.get("info", {}).get("rate")
             if rate is None:
                 raise ValueError(f"No rate in response: {r}")
         except Exception as e:
+            metrics.incr("sanitize.fx_failures")
             print(f"⚠️ FX lookup failed for {base_ccy} on {date_str}: {e}")
             rate = 1.0
     FX_CACHE[key] = rate
@@ -199,31 +211,42 @@ def sanitize_file(path):
 
 # ─── MAIN PIPELINE ────────────────────────────────────────────────────────────
 def main():
+    metrics.install()
+
     dfs = []
     for p in glob(os.path.join(DATA_DIR, "*.csv")):
-        sf = sanitize_file(p)
-        if sf is not None:
-            dfs.append(sf)
+        name = os.path.splitext(os.path.basename(p))[0].lower()
+        with metrics.stage(f"sanitize.file.{name}") as s:
+            sf = sanitize_file(p)
+            if sf is not None:
+                s["rows"] = len(sf)
+                dfs.append(sf)
+        metrics.incr("sanitize.files_sanitized" if sf is not None else "sanitize.files_skipped")
     if not dfs:
         raise RuntimeError("No CSVs sanitized – check your column names!")
 
-    combined = pd.concat(dfs, ignore_index=True)
+    # categorical city/country/currency and datetime64 dates; numeric precision and the
+    # postcode display form are kept since combined_dataset.csv feeds the geocoder
+    combined = schema.normalize_frame(pd.concat(dfs, ignore_index=True), name="sanitize.combined",
+                                      downcast=False, postcodes=False)
 
     # convert & inflation adjustment
     def convert(row):
-        ds  = row["dataset_date"].isoformat()
-        fx  = get_fx_rate(ds, row["currency"])
+        date = row["dataset_date"].date()
+        fx  = get_fx_rate(date.isoformat(), row["currency"])
         usd = row["sale_price"] * fx
-        inf = inflation_factor(row["dataset_date"])
+        inf = inflation_factor(date)
         return pd.Series({
             "sale_price_usd":                    usd,
             "sale_price_usd_inflation_adjusted": usd * inf
         })
 
-    conv        = combined.apply(convert, axis=1)
-    combined    = pd.concat([combined, conv], axis=1)
+    with metrics.stage("sanitize.convert_currency", rows=len(combined)):
+        conv        = combined.apply(convert, axis=1)
+        combined    = pd.concat([combined, conv], axis=1)
 
-    combined.to_csv(OUTPUT, index=False)
+    with metrics.stage("sanitize.write_output", rows=len(combined)):
+        combined.to_csv(OUTPUT, index=False)
     print(f"✅ Wrote {len(combined)} rows × {combined.shape[1]} cols → {OUTPUT}")
 
 if __name__ == "__main__":
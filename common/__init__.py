@@ -0,0 +1,3 @@
+"""
+Helpers shared by the sanitization, feature engineering and model code.
+"""
@@ -0,0 +1,254 @@
+# instrumentation.py
+import os
+import json
+import time
+import atexit
+import bisect
+import pstats
+import cProfile
+import tracemalloc
+from io import StringIO
+from contextlib import contextmanager
+
+"""
+Lightweight pipeline metrics: counters, histograms and per-stage wall time.
+Everything is kept in memory and reported once at the end of a run instead of
+logging every row. Set the following environment variables to change behaviour:
+
+    PIPELINE_METRICS_FILE   write the metrics as JSON to this path on exit
+    PIPELINE_PROFILE        "1" to run the whole process under cProfile
+    PIPELINE_TRACEMALLOC    "1" to track peak Python memory with tracemalloc
+"""
+
+METRICS_FILE_ENV = "PIPELINE_METRICS_FILE"
+PROFILE_ENV      = "PIPELINE_PROFILE"
+TRACEMALLOC_ENV  = "PIPELINE_TRACEMALLOC"
+
+# Histogram bucket upper bounds (seconds for timings, but any unit works)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+
+def _env_flag(name):
+    return os.getenv(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+class Histogram:
+    """Running count/sum/min/max plus fixed bucket counts (no per-sample storage)."""
+
+    __slots__ = ("count", "total", "min", "max", "bounds", "buckets")
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.bounds = tuple(bounds)
+        self.buckets = [0] * (len(self.bounds) + 1)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self):
+        labels = [f"<={b}" for b in self.bounds] + [f">{self.bounds[-1]}"]
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean":  self.mean,
+            "min":   self.min,
+            "max":   self.max,
+            "buckets": {l: n for l, n in zip(labels, self.buckets) if n},
+        }
+
+
+class Metrics:
+    """In-memory registry of counters, histograms and stage timings."""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.stages = {}
+        self.started = time.perf_counter()
+        self.profiler = None
+        self.profile_text = None
+        self.peak_memory = None
+
+    # ─── RECORDING ────────────────────────────────────────────────────────────
+    def incr(self, name, n=1):
+        """Increment a counter."""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, value, bounds=DEFAULT_BUCKETS):
+        """Record one value in a histogram (`bounds` only applies when it is created)."""
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = Histogram(bounds)
+        hist.observe(value)
+
+    def cache(self, name, hit):
+        """Record a cache lookup for the cache called `name`."""
+        self.incr(f"{name}.cache_hit" if hit else f"{name}.cache_miss")
+
+    @contextmanager
+    def timer(self, name):
+        """Time a block (e.g. one remote call) into the `name` histogram."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """
+        Time a pipeline stage. `rows` may be given up front or set on the
+        yielded dict (``s["rows"] = len(df)``) to get a rows/sec figure.
+        """
+        info = {"rows": rows}
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            elapsed = time.perf_counter() - start
+            entry = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0, "rows": 0})
+            entry["calls"] += 1
+            entry["seconds"] += elapsed
+            if info["rows"]:
+                entry["rows"] += int(info["rows"])
+
+    # ─── PROFILING HOOKS ──────────────────────────────────────────────────────
+    def start_profiling(self, cpu=True, memory=True):
+        """Start cProfile and/or tracemalloc; results land in the report."""
+        if cpu and self.profiler is None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stop_profiling(self, top=20):
+        if self.profiler is not None:
+            self.profiler.disable()
+            out = StringIO()
+            pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(top)
+            self.profile_text = out.getvalue()
+            self.profiler = None
+        if tracemalloc.is_tracing():
+            _, peak = tracemalloc.get_traced_memory()
+            self.peak_memory = peak
+            tracemalloc.stop()
+
+    # ─── REPORTING ────────────────────────────────────────────────────────────
+    def cache_ratios(self):
+        ratios = {}
+        for key, hits in self.counters.items():
+            if key.endswith(".cache_hit"):
+                name = key[: -len(".cache_hit")]
+                total = hits + self.counters.get(f"{name}.cache_miss", 0)
+                ratios[name] = hits / total if total else 0.0
+        for key in self.counters:
+            if key.endswith(".cache_miss"):
+                ratios.setdefault(key[: -len(".cache_miss")], 0.0)
+        return ratios
+
+    def to_dict(self):
+        stages = {}
+        for name, s in self.stages.items():
+            stages[name] = dict(s)
+            if s["rows"] and s["seconds"]:
+                stages[name]["rows_per_sec"] = s["rows"] / s["seconds"]
+        return {
+            "wall_seconds": time.perf_counter() - self.started,
+            "stages":       stages,
+            "counters":     dict(self.counters),
+            "cache_ratios": self.cache_ratios(),
+            "histograms":   {n: h.to_dict() for n, h in self.histograms.items()},
+            "peak_memory_bytes": self.peak_memory,
+        }
+
+    def report(self):
+        """Human-readable summary of everything recorded so far."""
+        data = self.to_dict()
+        lines = [f"─── Pipeline metrics ({data['wall_seconds']:.2f}s wall) ───"]
+        if data["stages"]:
+            lines.append("Stages:")
+            for name, s in data["stages"].items():
+                line = f"  {name:<40} {s['seconds']:>9.3f}s  x{s['calls']}"
+                if s["rows"]:
+                    line += f"  {s['rows']} rows"
+                if "rows_per_sec" in s:
+                    line += f"  ({s['rows_per_sec']:,.1f} rows/s)"
+                lines.append(line)
+        if data["counters"]:
+            lines.append("Counters:")
+            for name, n in sorted(data["counters"].items()):
+                lines.append(f"  {name:<40} {n}")
+        if data["cache_ratios"]:
+            lines.append("Cache hit ratios:")
+            for name, r in sorted(data["cache_ratios"].items()):
+                lines.append(f"  {name:<40} {r:.1%}")
+        if data["histograms"]:
+            lines.append("Histograms:")
+            for name, h in sorted(data["histograms"].items()):
+                lines.append(
+                    f"  {name:<40} n={h['count']} mean={h['mean']:.6g} "
+                    f"min={h['min']:.6g} max={h['max']:.6g} total={h['total']:.6g}"
+                )
+        if data["peak_memory_bytes"] is not None:
+            lines.append(f"Peak traced memory: {data['peak_memory_bytes'] / 2**20:.1f} MiB")
+        if self.profile_text:
+            lines.append("cProfile (top by cumulative time):")
+            lines.append(self.profile_text.rstrip())
+        return "\n".join(lines)
+
+    def write(self, path):
+        """Dump the metrics as JSON."""
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def reset(self):
+        self.__init__()
+
+
+# ─── DEFAULT REGISTRY ─────────────────────────────────────────────────────────
+METRICS = Metrics()
+
+incr    = METRICS.incr
+observe = METRICS.observe
+cache   = METRICS.cache
+timer   = METRICS.timer
+stage   = METRICS.stage
+
+
+def finish(path=None, print_report=True):
+    """Stop any profiling, print the summary and write the metrics file if configured."""
+    METRICS.stop_profiling()
+    path = path or os.getenv(METRICS_FILE_ENV)
+    if path:
+        METRICS.write(path)
+    if print_report:
+        print(METRICS.report())
+
+
+def enable_from_env():
+    """Turn on cProfile/tracemalloc according to PIPELINE_PROFILE / PIPELINE_TRACEMALLOC."""
+    cpu, memory = _env_flag(PROFILE_ENV), _env_flag(TRACEMALLOC_ENV)
+    if cpu or memory:
+        METRICS.start_profiling(cpu=cpu, memory=memory)
+
+
+def install(print_report=True):
+    """
+    Call once from a script's entry point: enables env-configured profiling and
+    reports the metrics when the process exits.
+    """
+    enable_from_env()
+    atexit.register(finish, print_report=print_report)
@@ -0,0 +1,115 @@
+# schema.py
+import pandas as pd
+
+from common import instrumentation as metrics
+
+"""
+Schema for the combined housing dataset. normalize_frame() shrinks a frame in
+place of the ad-hoc astype/str fixes each stage used to do:
+    - city / country / currency (and other low-cardinality strings) -> category
+    - dataset_date -> datetime64
+    - postcode -> one normalized string per distinct value, stored as category
+    - numeric columns downcast to the smallest int / float32 that fits
+
+The float32 downcast is lossy, so it is meant for in-memory working sets
+(load_dataset); scripts that write CSVs for later stages pass downcast=False.
+"""
+
+CATEGORICAL_COLUMNS = ["city", "country", "currency"]
+DATE_COLUMNS        = ["dataset_date"]
+POSTCODE_COLUMN     = "postcode"
+
+# Prices (regression targets) and coordinates keep full float64 precision
+FLOAT64_COLUMNS = [
+    "sale_price", "sale_price_usd", "sale_price_usd_inflation_adjusted",
+    "latitude", "longitude",
+]
+
+# Any other string column becomes a category when unique values / rows is below this
+CATEGORY_MAX_RATIO = 0.5
+
+MISSING_POSTCODES = ["", "NAN", "NONE", "<NA>"]
+NUMERIC_INFERRED  = ("integer", "floating", "mixed-integer-float", "decimal", "empty")
+
+# Histogram buckets for frame sizes: 1 MiB, 8 MiB, 64 MiB, 512 MiB, 4 GiB
+MEMORY_BUCKETS = (2**20, 2**23, 2**26, 2**29, 2**32)
+
+
+def normalize_postcodes(series):
+    """Uppercase, drop whitespace and a trailing '.0' left over from float parsing."""
+    pc = series.astype(str).str.strip().str.upper()
+    pc = pc.str.replace(r"\s+", "", regex=True).str.replace(r"\.0$", "", regex=True)
+    pc = pc.where(series.notna() & ~pc.isin(MISSING_POSTCODES))
+    return pc.astype("category")
+
+
+def downcast_numeric(series, downcast=True):
+    if not downcast:
+        return pd.to_numeric(series)
+    if series.name in FLOAT64_COLUMNS:
+        return series.astype("float64")
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast="integer")
+    return pd.to_numeric(series, downcast="float")
+
+
+def compact_object(series, downcast=True):
+    """Numbers stored as objects (e.g. a column that started as None) or low-cardinality strings."""
+    if pd.api.types.infer_dtype(series, skipna=True) in NUMERIC_INFERRED:
+        return downcast_numeric(pd.to_numeric(series), downcast)
+    try:
+        unique = series.nunique(dropna=True)
+    except TypeError:    # unhashable values such as dicts
+        return series
+    if len(series) and unique / len(series) < CATEGORY_MAX_RATIO:
+        return series.astype("category")
+    return series
+
+
+def memory_usage(df):
+    """Deep memory usage of a frame in bytes (includes Python string objects)."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def normalize_frame(df, name="schema", downcast=True, postcodes=True, verbose=True):
+    """
+    Return a copy of df converted to the compact schema and report memory saved
+    under `name`. downcast=False keeps numeric precision and postcodes=False
+    keeps postcodes in their original display form (e.g. "SW19 8NY").
+    """
+    before = memory_usage(df)
+    df = df.drop(columns=[c for c in df.columns if str(c).startswith("Unnamed:")])
+
+    for col in df.columns:
+        s = df[col]
+        if col == POSTCODE_COLUMN:
+            if postcodes:
+                df[col] = normalize_postcodes(s)
+        elif col in DATE_COLUMNS:
+            df[col] = pd.to_datetime(s)
+        elif col in CATEGORICAL_COLUMNS:
+            df[col] = s.astype("category")
+        elif pd.api.types.is_bool_dtype(s):
+            continue
+        elif pd.api.types.is_numeric_dtype(s):
+            df[col] = downcast_numeric(s, downcast)
+        elif s.dtype == object or pd.api.types.is_string_dtype(s):
+            df[col] = compact_object(s, downcast)
+
+    after = memory_usage(df)
+    metrics.observe(f"{name}.bytes_before", before, bounds=MEMORY_BUCKETS)
+    metrics.observe(f"{name}.bytes_after", after, bounds=MEMORY_BUCKETS)
+    if verbose:
+        ratio = before / after if after else float("inf")
+        print(f"Schema: {len(df)} rows, {before / 2**20:.1f} MiB → {after / 2**20:.1f} MiB ({ratio:.1f}x smaller)")
+    return df
+
+
+def load_dataset(path, name="schema.load_dataset", downcast=True, verbose=True, **read_csv_kwargs):
+    """Read a housing CSV straight into the compact schema."""
+    read_csv_kwargs.setdefault("dtype", {POSTCODE_COLUMN: str})
+    with metrics.stage(name) as s:
+        df = normalize_frame(pd.read_csv(path, **read_csv_kwargs), name=name,
+                             downcast=downcast, verbose=verbose)
+        s["rows"] = len(df)
+    return df
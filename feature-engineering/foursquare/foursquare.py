@@ -3,10 +3,14 @@ import requests
 import pandas as pd
 import time
 import os
+import sys
 import json
 from pathlib import Path
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)))
+from common import instrumentation as metrics
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
@@ -82,8 +86,9 @@ class FoursquareClient:
         cache_key = self._get_cache_key(latitude, longitude, radius, limit)
 
         if cache_key in self.cache:
-            logger.info(f"Venues found in cache for ({latitude:.4f}, {longitude:.4f})")
+            metrics.cache("foursquare", hit=True)
             return self.cache[cache_key]
+        metrics.cache("foursquare", hit=False)
 
         params = {
             "ll": f"{latitude},{longitude}",
@@ -93,23 +98,28 @@ class FoursquareClient:
         }
 
         try:
-            logger.info(f"Querying venues near ({latitude:.4f}, {longitude:.4f})")
-            response = requests.get(
-                self.base_url,
-                headers=self.headers,
-                params=params,
-                timeout=10
-            )
+            logger.debug(f"Querying venues near ({latitude:.4f}, {longitude:.4f})")
+            metrics.incr("foursquare.requests")
+            with metrics.timer("foursquare.request"):
+                response = requests.get(
+                    self.base_url,
+                    headers=self.headers,
+                    params=params,
+                    timeout=10
+                )
             response.raise_for_status()
             venues = response.json().get('results', [])
 
             self.cache[cache_key] = venues
-            self._save_cache()
-            time.sleep(0.5)  # Rate limiting
+            with metrics.timer("foursquare.save_cache"):
+                self._save_cache()
+            with metrics.timer("foursquare.rate_limit_sleep"):
+                time.sleep(0.5)  # Rate limiting
 
             return venues
 
         except requests.exceptions.RequestException as e:
+            metrics.incr("foursquare.request_errors")
             logger.error(f"API request failed: {str(e)}")
             return []
 
@@ -165,29 +175,34 @@ class FoursquareClient:
     def process_csv(self, input_file, output_file, radius=1000, batch_size=None):
         """Process property CSV and enrich with venue data."""
         logger.info(f"Loading input file: {input_file}")
-        df = pd.read_csv(input_file)
+        with metrics.stage("foursquare.load_input"):
+            df = pd.read_csv(input_file)
 
         if batch_size:
             df = df.head(batch_size)
 
         results = []
 
-        for idx, row in df.iterrows():
-            try:
-                venues = self.get_venues(row['latitude'], row['longitude'], radius)
-                df_venues = self.venues_to_dataframe(venues)
-                venue_stats = self.count_venue_types(df_venues)
-                results.append({**row.to_dict(), **venue_stats})
-
-            except Exception as e:
-                logger.error(f"Error processing property {idx}: {str(e)}")
-                continue
-
-        pd.DataFrame(results).to_csv(output_file, index=False)
+        with metrics.stage("foursquare.enrich", rows=len(df)):
+            for idx, row in df.iterrows():
+                try:
+                    venues = self.get_venues(row['latitude'], row['longitude'], radius)
+                    df_venues = self.venues_to_dataframe(venues)
+                    venue_stats = self.count_venue_types(df_venues)
+                    results.append({**row.to_dict(), **venue_stats})
+
+                except Exception as e:
+                    metrics.incr("foursquare.failed_rows")
+                    logger.error(f"Error processing property {idx}: {str(e)}")
+                    continue
+
+        with metrics.stage("foursquare.write_output", rows=len(results)):
+            pd.DataFrame(results).to_csv(output_file, index=False)
         logger.info(f"Saved results to {output_file}")
 
 
 if __name__ == "__main__":
+    metrics.install()
     client = FoursquareClient()
     input_csv = "geocoded_dataset.csv"
     output_csv = "foursquare_enriched_dataset.csv"
@@ -1,10 +1,15 @@
 # geocoder.py
+import os
+import sys
 import logging
 from tenacity import retry, stop_after_attempt, wait_exponential
 from geopy.geocoders import Nominatim
 from geopy.extra.rate_limiter import RateLimiter
 import pandas as pd
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)))
+from common import instrumentation as metrics
+
 """
 Takes in Original Dataset and Adds Latitute and Longitude information (Geolocation Data)
 Creates a new CSV file and outputs the modified dataset in geocoded_dataset.csv
@@ -31,24 +36,37 @@ class RobustPostcodeGeocoder:
         self.cache = {}
         self.max_retries = max_retries
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     def _geocode_single(self, postcode, country):
-        """Geocode with retries and exponential backoff."""
+        """Cached geocode; the cache is checked once per lookup, not per retry."""
         cache_key = f"{postcode},{country}"
         if cache_key in self.cache:
+            metrics.cache("geocoder", hit=True)
             return self.cache[cache_key]
+        metrics.cache("geocoder", hit=False)
+
+        coords = self._geocode_remote(postcode, country)
+        if coords != (None, None):
+            self.cache[cache_key] = coords
+        return coords
 
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10),
+           before_sleep=lambda _: metrics.incr("geocoder.retries"))
+    def _geocode_remote(self, postcode, country):
+        """Geocode with retries and exponential backoff."""
         try:
-            location = self.geocode(f"{postcode}, {country}", timeout=10)
+            metrics.incr("geocoder.requests")
+            with metrics.timer("geocoder.request"):
+                location = self.geocode(f"{postcode}, {country}", timeout=10)
             if location:
                 coords = (location.latitude, location.longitude)
-                self.cache[cache_key] = coords
-                logger.info(f"Geocoded: {postcode}, {country} → {coords}")
+                logger.debug(f"Geocoded: {postcode}, {country} → {coords}")
                 return coords
-            logger.warning(f"No results for: {postcode}, {country}")
+            metrics.incr("geocoder.no_results")
+            logger.debug(f"No results for: {postcode}, {country}")
             return (None, None)
         except Exception as e:
-            logger.error(f"Geocoding attempt failed for {postcode}, {country}: {str(e)}")
+            metrics.incr("geocoder.request_errors")
+            logger.debug(f"Geocoding attempt failed for {postcode}, {country}: {str(e)}")
             raise
 
     def _find_nearby_postcodes(self, postcode, country):
@@ -75,17 +93,19 @@ class RobustPostcodeGeocoder:
             if exact_coords != (None, None):
                 return exact_coords
         except Exception as e:
-            logger.warning(f"Primary geocoding failed for {postcode}, {country}. Attempting fallbacks...")
+            metrics.incr("geocoder.primary_failures")
+            logger.debug(f"Primary geocoding failed for {postcode}, {country}. Attempting fallbacks...")
 
         # then try nearby postcodes
         for fallback_postcode in self._find_nearby_postcodes(postcode, country):
             try:
                 fallback_coords = self._geocode_single(fallback_postcode, country)
                 if fallback_coords != (None, None):
-                    logger.info(f"Used fallback: {postcode} → {fallback_postcode}")
+                    metrics.incr("geocoder.fallback_postcode")
+                    logger.debug(f"Used fallback: {postcode} → {fallback_postcode}")
                     return fallback_coords
             except Exception as e:
-                logger.error(f"Fallback failed for {fallback_postcode}: {str(e)}")
+                logger.debug(f"Fallback failed for {fallback_postcode}: {str(e)}")
                 continue
 
         # Lastly Approximate centroid
@@ -97,10 +117,12 @@ class RobustPostcodeGeocoder:
             }.get(country, (None, None))
 
             if country_coords != (None, None):
-                logger.warning(f"Using country centroid for {postcode}, {country}")
+                metrics.incr("geocoder.fallback_centroid")
+                logger.debug(f"Using country centroid for {postcode}, {country}")
                 return country_coords
         except Exception as e:
             logger.critical(f"All fallbacks exhausted for {postcode}, {country}")
+        metrics.incr("geocoder.unresolved")
         return (None, None)
 
     def batch_geocode(self, df, postcode_col="postcode", country_col="country"):
@@ -108,22 +130,27 @@ class RobustPostcodeGeocoder:
         results = []
         failed_indices = []
 
-        for idx, row in df.iterrows():
-            try:
-                coords = self.geocode_with_fallback(row[postcode_col], row[country_col])
-                results.append({**row.to_dict(), "latitude": coords[0], "longitude": coords[1]})
-            except Exception as e:
-                logger.error(f"Row {idx} failed: {str(e)}")
-                failed_indices.append(idx)
-                results.append({**row.to_dict(), "latitude": None, "longitude": None})
+        with metrics.stage("geocoder.batch_geocode", rows=len(df)):
+            for idx, row in df.iterrows():
+                try:
+                    coords = self.geocode_with_fallback(row[postcode_col], row[country_col])
+                    results.append({**row.to_dict(), "latitude": coords[0], "longitude": coords[1]})
+                except Exception as e:
+                    logger.error(f"Row {idx} failed: {str(e)}")
+                    failed_indices.append(idx)
+                    results.append({**row.to_dict(), "latitude": None, "longitude": None})
+        metrics.incr("geocoder.failed_rows", len(failed_indices))
 
         logger.info(f"Completed. Failed rows: {len(failed_indices)}/{len(df)}")
         return pd.DataFrame(results), failed_indices
 
 if __name__ == "__main__":
+    metrics.install()
     geocoder = RobustPostcodeGeocoder(max_retries=3)
-    df = pd.read_csv('original_dataset.csv', dtype=str)
+    with metrics.stage("geocoder.load_input"):
+        df = pd.read_csv('original_dataset.csv', dtype=str)
     result_df, failed = geocoder.batch_geocode(df)
-    result_df.to_csv(OUTPUT_FILENAME)
+    with metrics.stage("geocoder.write_output", rows=len(result_df)):
+        result_df.to_csv(OUTPUT_FILENAME)
     if failed:
         print(f"\nFailed rows: {failed}")
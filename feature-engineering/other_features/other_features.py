@@ -1,13 +1,23 @@
+import os
+import sys
 import json
 import pandas as pd
 import requests
 import time
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)))
+from common import instrumentation as metrics
+from common import schema
+
 load_dotenv()
+metrics.install()
 
 # dataset after first round of feature enrichment
-housing_df = pd.read_csv("../foursquare/foursquare_enriched_dataset.csv")
+# postcodes come back normalized (no spaces, upper case, no trailing ".0");
+# numerics keep full precision since this frame is written back out
+housing_df = schema.load_dataset("../foursquare/foursquare_enriched_dataset.csv",
+                                 name="other_features.load_input", downcast=False)
 
 # add median household income for USA
 # this data is from the 2023 census
@@ -21,11 +31,13 @@ def median_income_enrichment_usa(df):
     # batch all ZCTAs from ACS for merging, median household income
     print("Fetching all ZIP-level income data from ACS (USA Census)...")
     MEDIAN_INCOME = "B19013_001E"
-    acs_data = c.acs5.get(
-        fields=["NAME", MEDIAN_INCOME],
-        geo={"for": "zip code tabulation area:*"},
-        year=2023
-    )
+    metrics.incr("other_features.census_requests")
+    with metrics.timer("other_features.census_request"):
+        acs_data = c.acs5.get(
+            fields=["NAME", MEDIAN_INCOME],
+            geo={"for": "zip code tabulation area:*"},
+            year=2023
+        )
     median_income_df = pd.DataFrame(acs_data)
     median_income_df.rename(columns={
         "zip code tabulation area": "postcode",
@@ -47,34 +59,29 @@ def get_london_msoa(df):
     # query api.postcodes.io for MSOA codes for each postcode
     print("Fetching MSOAs for London postcodes...")
     msoa_map = {}
-    count = 0
-    for pc in london_df["postcode"].unique():
-        count += 1
-        print(count)
-        try:
-            res = requests.get(f"https://api.postcodes.io/postcodes/{pc}")
-            if res.status_code == 200:
-                result = res.json().get("result")
-                if result and result.get("msoa"):
-                    msoa_map[pc] = result["codes"]["msoa"]
-        except Exception as e:
-            print(f"Error with postcode {pc}: {e}")
-        time.sleep(0.1)
+    postcodes = london_df["postcode"].unique()
+    with metrics.stage("other_features.london_msoa_lookup", rows=len(postcodes)):
+        for pc in postcodes:
+            try:
+                metrics.incr("other_features.postcodes_io_requests")
+                with metrics.timer("other_features.postcodes_io_request"):
+                    res = requests.get(f"https://api.postcodes.io/postcodes/{pc}")
+                if res.status_code == 200:
+                    result = res.json().get("result")
+                    if result and result.get("msoa"):
+                        msoa_map[pc] = result["codes"]["msoa"]
+                else:
+                    metrics.incr(f"other_features.postcodes_io_status_{res.status_code}")
+            except Exception as e:
+                metrics.incr("other_features.postcodes_io_errors")
+                print(f"Error with postcode {pc}: {e}")
+            time.sleep(0.1)
 
     with open("london_postcode_to_msoa.json", "w") as f:
         json.dump(msoa_map, f)
 
 def median_income_enrichment_london(df, income_by_msoa_file_path):
-    # modify column to London postcodes are just one string without spaces
-    df.loc[df["city"] == "London", "postcode"] = (
-        df.loc[df["city"] == "London", "postcode"]
-        .astype(str)
-        .str.replace(" ", "", regex=False)
-        .str.upper()
-    )
-
     london_df = df[df["city"] == "London"].copy()
-    london_df["postcode"] = london_df["postcode"].astype(str).str.replace(" ", "").str.upper()
 
     # only call this once! find postcode to MSOA mapping
     # it takes like 20 minutes so don't redo after generating initial JSON file
@@ -118,25 +125,24 @@ def median_income_enrichment_aus(df):
     return df.merge(aus_income_df[["postcode", "median_income_tmp"]], on="postcode", how="left")
 
 
-# process the postcodes so they are all strings
-housing_df["postcode"] = housing_df["postcode"].astype(str)
-housing_df.loc[housing_df["country"] == "USA", "postcode"] = housing_df.loc[housing_df["country"] == "USA", "postcode"].astype(str).str[:-2]
-housing_df.loc[housing_df["country"] == "Australia", "postcode"] = housing_df.loc[housing_df["country"] == "Australia", "postcode"].astype(str).str[:-2]
-
 # apply enrichment for all three countries
 housing_df["median_income"] = None
 
-housing_df = median_income_enrichment_usa(housing_df)
-housing_df["median_income"] = housing_df["median_income"].combine_first(housing_df["median_income_tmp"])
-housing_df.drop(columns=["median_income_tmp"], inplace=True)
+with metrics.stage("other_features.income_usa", rows=len(housing_df)):
+    housing_df = median_income_enrichment_usa(housing_df)
+    housing_df["median_income"] = housing_df["median_income"].combine_first(housing_df["median_income_tmp"])
+    housing_df.drop(columns=["median_income_tmp"], inplace=True)
 
-housing_df = median_income_enrichment_london(housing_df, "uk_msoa_median_household_income.csv")
-housing_df["median_income"] = housing_df["median_income"].combine_first(housing_df["median_income_tmp"])
-housing_df.drop(columns=["median_income_tmp"], inplace=True)
+with metrics.stage("other_features.income_london", rows=len(housing_df)):
+    housing_df = median_income_enrichment_london(housing_df, "uk_msoa_median_household_income.csv")
+    housing_df["median_income"] = housing_df["median_income"].combine_first(housing_df["median_income_tmp"])
+    housing_df.drop(columns=["median_income_tmp"], inplace=True)
 
-housing_df = median_income_enrichment_aus(housing_df)
-housing_df["median_income"] = housing_df["median_income"].combine_first(housing_df["median_income_tmp"])
-housing_df.drop(columns=["median_income_tmp"], inplace=True)
+with metrics.stage("other_features.income_aus", rows=len(housing_df)):
+    housing_df = median_income_enrichment_aus(housing_df)
+    housing_df["median_income"] = housing_df["median_income"].combine_first(housing_df["median_income_tmp"])
+    housing_df.drop(columns=["median_income_tmp"], inplace=True)
 
 # save new file
-housing_df.to_csv("final_enriched_dataset.csv", index=False)
+with metrics.stage("other_features.write_output", rows=len(housing_df)):
+    housing_df.to_csv("final_enriched_dataset.csv", index=False)